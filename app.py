@@ -5,7 +5,7 @@ import os
 
 from pdf_processor import process_pdfs_with_pdfminer
 from rag_manager import RAGManager, setup_embeddings
-from langchain_community.vectorstores import Chroma
+from vector_store import ingest_documents
 from study_planner import create_study_plan
 
 
@@ -82,8 +82,7 @@ with st.sidebar:
 
             if documents:
                 embeddings = setup_embeddings()
-                vectordb = Chroma.from_documents(documents, embedding=embeddings, persist_directory=st.session_state.db_dir)
-                vectordb.persist()
+                ingest_documents(documents, st.session_state.db_dir, embeddings)
             
             embeddings = setup_embeddings()
             
@@ -0,0 +1,226 @@
+import os
+import json
+import time
+import argparse
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from pdf_processor import process_pdfs_with_pdfminer
+from rag_manager import RAGManager, setup_embeddings
+from vector_store import ingest_documents
+
+DEFAULT_DATA_DIR = "data"
+DEFAULT_DB_DIR = "vectordb"
+
+
+def ingest(args):
+    """Extract every PDF in data_dir and add it to the vector database"""
+    os.makedirs(args.db_dir, exist_ok=True)
+
+    documents = process_pdfs_with_pdfminer(args.data_dir, args.db_dir)
+
+    if not documents:
+        print(f"No documents found in {args.data_dir}")
+        return 1
+
+    embeddings = setup_embeddings()
+    ingest_documents(documents, args.db_dir, embeddings)
+
+    print(f"Ingested {len(documents)} documents into {args.db_dir}")
+    return 0
+
+
+def query(args):
+    """Answer a single question and print it to stdout"""
+    rag_manager = RAGManager(db_dir=args.db_dir, embeddings=setup_embeddings())
+
+    try:
+        docs = rag_manager.retrieve(args.question)
+        print(rag_manager.generate(args.question, docs))
+    except Exception as e:
+        print(f"Error answering query: {e}")
+        print(traceback.format_exc())
+        return 1
+
+    return 0
+
+
+def load_batch_queries(input_path):
+    """Read queries from a JSONL file, one {"id", "query"} object per line"""
+    queries = []
+    seen_ids = set()
+
+    with open(input_path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {line_no}: invalid JSON ({e})")
+                continue
+
+            if not isinstance(record, dict):
+                print(f"Skipping line {line_no}: expected a JSON object")
+                continue
+
+            question = record.get("query", record.get("question"))
+            if not question:
+                print(f"Skipping line {line_no}: no query")
+                continue
+
+            query_id = str(record.get("id", line_no))
+            if query_id in seen_ids:
+                print(f"Skipping line {line_no}: duplicate id {query_id}")
+                continue
+
+            seen_ids.add(query_id)
+            queries.append((query_id, question))
+
+    return queries
+
+
+def load_completed_ids(output_path):
+    """Return ids already answered successfully in a previous run"""
+    completed = set()
+
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write leaves a partial last line behind
+                continue
+
+            if "error" not in record:
+                completed.add(str(record["id"]))
+
+    return completed
+
+
+def end_partial_line(output_path):
+    """Terminate a partial last line so the next record starts on a line of its own"""
+    if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+        return
+
+    with open(output_path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def run_batch_query(rag_manager, query_id, question, generation_slots, k):
+    """Retrieve freely, then wait for a generation slot before calling the LLM"""
+    record = {"id": query_id, "query": question}
+    start = time.perf_counter()
+
+    try:
+        docs = rag_manager.retrieve(question, k=k)
+        retrieved = time.perf_counter()
+        record["retrieval_seconds"] = round(retrieved - start, 4)
+        record["sources"] = [doc.metadata.get("source") for doc in docs]
+
+        with generation_slots:
+            generation_start = time.perf_counter()
+            record["response"] = rag_manager.generate(question, docs)
+            record["generation_seconds"] = round(time.perf_counter() - generation_start, 4)
+            record["queue_seconds"] = round(generation_start - retrieved, 4)
+    except Exception as e:
+        print(f"Error answering {query_id}: {e}")
+        print(traceback.format_exc())
+        record["error"] = str(e)
+
+    record["total_seconds"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def batch_query(args):
+    """Answer every query in a JSONL file, appending results to the output as they finish"""
+    queries = load_batch_queries(args.input)
+    completed = load_completed_ids(args.output)
+    pending = [(query_id, question) for query_id, question in queries if query_id not in completed]
+
+    print(f"{len(queries)} queries, {len(queries) - len(pending)} already done, {len(pending)} to run")
+    if not pending:
+        return 0
+
+    rag_manager = RAGManager(db_dir=args.db_dir, embeddings=setup_embeddings())
+    generation_slots = threading.BoundedSemaphore(args.max_inflight)
+
+    end_partial_line(args.output)
+
+    failed = 0
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    try:
+        with open(args.output, "a", encoding="utf-8") as out:
+            futures = [
+                executor.submit(run_batch_query, rag_manager, query_id, question, generation_slots, args.k)
+                for query_id, question in pending
+            ]
+
+            for done, future in enumerate(as_completed(futures), start=1):
+                record = future.result()
+                if "error" in record:
+                    failed += 1
+
+                # Flush each answer to disk so an interrupted run resumes where it stopped
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+
+                print(f"[{done}/{len(pending)}] {record['id']} ({record['total_seconds']}s)")
+    except BaseException:
+        # Drop queued queries instead of answering them after the run was interrupted
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    print(f"Finished: {len(pending) - failed} answered, {failed} failed")
+    return 1 if failed else 0
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Headless access to the RAG advisor")
+    parser.add_argument("--db-dir", default=DEFAULT_DB_DIR, help="vector database directory")
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subparsers.add_parser("ingest", help="extract PDFs into the vector database")
+    ingest_parser.add_argument("--data-dir", default=DEFAULT_DATA_DIR, help="folder containing PDF files")
+    ingest_parser.set_defaults(func=ingest)
+
+    query_parser = subparsers.add_parser("query", help="answer a single question")
+    query_parser.add_argument("question")
+    query_parser.set_defaults(func=query)
+
+    batch_parser = subparsers.add_parser("batch-query", help="answer questions from a JSONL file")
+    batch_parser.add_argument("input", help="JSONL file with one {\"id\", \"query\"} object per line")
+    batch_parser.add_argument("output", help="JSONL file results are appended to; reused to resume")
+    batch_parser.add_argument("--workers", type=positive_int, default=8, help="queries retrieved in parallel")
+    batch_parser.add_argument("--max-inflight", type=positive_int, default=2, help="LLM generations running at once")
+    batch_parser.add_argument("--k", type=positive_int, default=3, help="documents retrieved per query")
+    batch_parser.set_defaults(func=batch_query)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
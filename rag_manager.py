@@ -1,9 +1,7 @@
-import os
 import re
 import traceback
 
 from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
 from langchain.prompts import PromptTemplate
@@ -15,6 +13,7 @@ import torch
 from dotenv import load_dotenv
 
 from pdf_processor import process_pdfs_with_pdfminer
+from vector_store import open_vectordb
 
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 
@@ -65,22 +64,7 @@ class RAGManager:
             print(f"Error initializing Ollama: {e}")
             raise e
         
-        try:
-            self.vectordb = Chroma(
-                persist_directory=db_dir,
-                embedding_function=embeddings
-            )
-
-        except Exception as e:
-            import shutil
-            if os.path.exists(db_dir):
-                shutil.rmtree(db_dir)
-                os.makedirs(db_dir, exist_ok=True)
-             
-            self.vectordb = Chroma(
-                persist_directory=db_dir,
-                embedding_function=embeddings
-            )
+        self.vectordb = open_vectordb(db_dir, embeddings)
 
         self.retriever = self.vectordb.as_retriever(
             search_type="similarity",
@@ -136,34 +120,41 @@ class RAGManager:
             
         return "\n\n".join(formatted_docs)
 
+    def retrieve(self, query, k=3):
+        """Retrieve the documents used as context for a query"""
+        return self.vectordb.similarity_search(query, k=k)
+
+    def generate(self, query, docs):
+        """Generate an answer for a query from already retrieved documents"""
+        if not docs:
+            return "متأسفانه اطلاعات مرتبطی با سوال شما در پایگاه داده یافت نشد."
+        
+        context = self.format_docs(docs)
+        
+        prompt = f"""<s>[INST]
+        شما یک دستیار آموزشی فارسی زبان هستید که به سوالات دانش‌آموزان پاسخ می‌دهد.
+        
+        اطلاعات مرتبط:
+        {context}
+        
+        سوال دانش‌آموز:
+        {query}
+        
+        پاسخ دهید:
+        [/INST]
+        """
+        
+        response = self.llm.invoke(prompt)
+        
+        response = response.strip()
+        
+        return response
+
     def get_response(self, query):
         """Get a response using the RAG chain with Ollama"""
         try:
-            docs = self.vectordb.similarity_search(query, k=3)
-            
-            if not docs:
-                return "متأسفانه اطلاعات مرتبطی با سوال شما در پایگاه داده یافت نشد."
-            
-            context = self.format_docs(docs)
-            
-            prompt = f"""<s>[INST]
-            شما یک دستیار آموزشی فارسی زبان هستید که به سوالات دانش‌آموزان پاسخ می‌دهد.
-            
-            اطلاعات مرتبط:
-            {context}
-            
-            سوال دانش‌آموز:
-            {query}
-            
-            پاسخ دهید:
-            [/INST]
-            """
-            
-            response = self.llm.invoke(prompt)
-            
-            response = response.strip()
-            
-            return response
+            docs = self.retrieve(query)
+            return self.generate(query, docs)
             
         except Exception as e:
             error_msg = str(e)
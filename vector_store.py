@@ -0,0 +1,368 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import traceback
+import uuid
+
+import numpy as np
+from chromadb.api.client import SharedSystemClient
+from langchain_chroma import Chroma
+
+SNAPSHOT_PREFIX = "v"
+TMP_PREFIX = ".tmp-"
+MANIFEST_FILE = "manifest.json"
+CHUNKS_FILE = "chunks.jsonl"
+EMBEDDINGS_FILE = "embeddings.npy"
+INDEX_DIR = "chroma"
+KEEP_SNAPSHOTS = 3
+KEEP_CORRUPT = 2
+SNAPSHOT_PAGE_SIZE = 1000
+REBUILD_BATCH_SIZE = 1000
+
+
+def get_snapshot_root(db_dir):
+    """Snapshots live next to db_dir so a broken db_dir can be replaced wholesale"""
+    db_dir = os.path.abspath(db_dir)
+    return os.path.join(os.path.dirname(db_dir), os.path.basename(db_dir) + "_snapshots")
+
+
+def file_checksum(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def directory_checksums(root):
+    checksums = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            checksums[os.path.relpath(path, root)] = file_checksum(path)
+    return checksums
+
+
+def list_snapshots(db_dir):
+    """Return snapshot versions, newest first"""
+    root = get_snapshot_root(db_dir)
+    if not os.path.isdir(root):
+        return []
+
+    versions = []
+    for name in os.listdir(root):
+        if name.startswith(SNAPSHOT_PREFIX) and name[len(SNAPSHOT_PREFIX):].isdigit():
+            versions.append(int(name[len(SNAPSHOT_PREFIX):]))
+
+    return sorted(versions, reverse=True)
+
+
+def snapshot_path(db_dir, version):
+    return os.path.join(get_snapshot_root(db_dir), f"{SNAPSHOT_PREFIX}{version:06d}")
+
+
+def load_manifest(db_dir, version):
+    with open(os.path.join(snapshot_path(db_dir, version), MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def latest_manifest(db_dir):
+    """Manifest of the newest snapshot, or None when nothing was ever snapshotted"""
+    for version in list_snapshots(db_dir):
+        try:
+            return load_manifest(db_dir, version)
+        except Exception as e:
+            print(f"Skipping unreadable snapshot {version}: {e}")
+    return None
+
+
+def write_json_atomic(path, data):
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=TMP_PREFIX)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_chunk_cache(vectordb, directory, page_size=SNAPSHOT_PAGE_SIZE):
+    """Page through the collection, streaming chunks to JSONL and embeddings to a memory-mapped array"""
+    collection = vectordb._collection
+    count = collection.count()
+    embeddings = None
+
+    with open(os.path.join(directory, CHUNKS_FILE), "w", encoding="utf-8") as f:
+        for offset in range(0, count, page_size):
+            page = collection.get(
+                limit=page_size, offset=offset, include=["embeddings", "documents", "metadatas"]
+            )
+            if not page["ids"]:
+                raise ValueError(f"collection shrank to {offset} chunks while snapshotting {count}")
+
+            vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            if embeddings is None:
+                embeddings = np.lib.format.open_memmap(
+                    os.path.join(directory, EMBEDDINGS_FILE),
+                    mode="w+",
+                    dtype=np.float32,
+                    shape=(count, vectors.shape[1]),
+                )
+            embeddings[offset:offset + len(vectors)] = vectors
+
+            for chunk_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                f.write(json.dumps({"id": chunk_id, "document": document, "metadata": metadata}, ensure_ascii=False) + "\n")
+
+    if embeddings is None:
+        np.save(os.path.join(directory, EMBEDDINGS_FILE), np.zeros((0, 0), dtype=np.float32))
+    else:
+        embeddings.flush()
+        del embeddings
+
+    return count
+
+
+def create_snapshot(db_dir, vectordb, keep=KEEP_SNAPSHOTS):
+    """Copy the index and its chunks/embeddings into a new versioned snapshot.
+
+    The snapshot is assembled in a temporary directory and renamed into place,
+    so a crash mid-write never leaves a half-written version behind.
+    """
+    root = get_snapshot_root(db_dir)
+    os.makedirs(root, exist_ok=True)
+
+    # A process killed mid-snapshot leaves its temporary copy behind
+    for name in os.listdir(root):
+        if name.startswith(TMP_PREFIX):
+            path = os.path.join(root, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+    versions = list_snapshots(db_dir)
+    version = versions[0] + 1 if versions else 1
+
+    tmp_dir = tempfile.mkdtemp(dir=root, prefix=TMP_PREFIX)
+    try:
+        shutil.copytree(db_dir, os.path.join(tmp_dir, INDEX_DIR))
+        count = write_chunk_cache(vectordb, tmp_dir)
+
+        manifest = {
+            "version": version,
+            "created_at": time.time(),
+            "count": count,
+            "index_checksums": directory_checksums(os.path.join(tmp_dir, INDEX_DIR)),
+            "chunks_checksum": file_checksum(os.path.join(tmp_dir, CHUNKS_FILE)),
+            "embeddings_checksum": file_checksum(os.path.join(tmp_dir, EMBEDDINGS_FILE)),
+        }
+        write_json_atomic(os.path.join(tmp_dir, MANIFEST_FILE), manifest)
+
+        os.rename(tmp_dir, snapshot_path(db_dir, version))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    for old_version in list_snapshots(db_dir)[keep:]:
+        shutil.rmtree(snapshot_path(db_dir, old_version), ignore_errors=True)
+
+    print(f"Saved vector store snapshot {version} ({manifest['count']} chunks)")
+    return version
+
+
+def check_vectordb(vectordb, expected_count=None):
+    """Raise if the collection cannot be read or searched, or has lost chunks"""
+    collection = vectordb._collection
+    count = collection.count()
+
+    if expected_count is not None and count < expected_count:
+        raise ValueError(f"collection has {count} chunks, last snapshot had {expected_count}")
+
+    if count:
+        # Exercising the ANN index catches corrupt segment files that count() does not touch
+        sample = collection.get(limit=1, include=["embeddings"])
+        collection.query(query_embeddings=[sample["embeddings"][0]], n_results=1)
+
+
+def open_chroma(db_dir, embeddings):
+    return Chroma(persist_directory=db_dir, embedding_function=embeddings)
+
+
+def try_open(db_dir, embeddings, expected_count=None):
+    try:
+        vectordb = open_chroma(db_dir, embeddings)
+        check_vectordb(vectordb, expected_count)
+        return vectordb
+    except Exception as e:
+        print(f"Vector store at {db_dir} failed integrity check: {e}")
+        # Chroma caches clients per path; drop them so the next open reads from disk again
+        SharedSystemClient.clear_system_cache()
+        return None
+
+
+def set_aside(db_dir, keep=KEEP_CORRUPT):
+    """Move a broken db_dir out of the way instead of deleting it, keeping only the newest few"""
+    if not os.path.exists(db_dir):
+        return
+    db_dir = os.path.abspath(db_dir)
+    prefix = f"{os.path.basename(db_dir)}.corrupt-"
+    broken_dir = f"{db_dir}.corrupt-{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    os.rename(db_dir, broken_dir)
+    print(f"Moved broken vector store to {broken_dir}")
+
+    def moved_at(name):
+        try:
+            return int(name[len(prefix):].split("-")[0])
+        except ValueError:
+            return 0
+
+    parent = os.path.dirname(db_dir)
+    broken_dirs = sorted((name for name in os.listdir(parent) if name.startswith(prefix)), key=moved_at, reverse=True)
+    for name in broken_dirs[keep:]:
+        shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+
+def clear_scratch(db_dir):
+    """Remove what a failed recovery attempt left in db_dir; the snapshot still holds it"""
+    shutil.rmtree(db_dir, ignore_errors=True)
+
+
+def restore_index(db_dir, embeddings, version, manifest):
+    """Copy a snapshot's index files back into db_dir"""
+    index_dir = os.path.join(snapshot_path(db_dir, version), INDEX_DIR)
+    if directory_checksums(index_dir) != manifest["index_checksums"]:
+        raise ValueError("index files do not match the manifest")
+
+    clear_scratch(db_dir)
+    shutil.copytree(index_dir, db_dir)
+
+    vectordb = try_open(db_dir, embeddings, manifest["count"])
+    if vectordb is None:
+        raise ValueError("restored index failed integrity check")
+    return vectordb
+
+
+def rebuild_from_cache(db_dir, embeddings, version, manifest):
+    """Rebuild db_dir from a snapshot's cached chunks and embeddings, skipping PDF extraction and embedding"""
+    directory = snapshot_path(db_dir, version)
+    chunks_path = os.path.join(directory, CHUNKS_FILE)
+    embeddings_path = os.path.join(directory, EMBEDDINGS_FILE)
+
+    if file_checksum(chunks_path) != manifest["chunks_checksum"]:
+        raise ValueError("cached chunks do not match the manifest")
+    if file_checksum(embeddings_path) != manifest["embeddings_checksum"]:
+        raise ValueError("cached embeddings do not match the manifest")
+
+    vectors = np.load(embeddings_path, mmap_mode="r")
+    if len(vectors) != manifest["count"]:
+        raise ValueError("cached embeddings do not match the manifest count")
+
+    clear_scratch(db_dir)
+    os.makedirs(db_dir, exist_ok=True)
+    vectordb = open_chroma(db_dir, embeddings)
+
+    def add_batch(batch, start):
+        vectordb._collection.add(
+            ids=[chunk["id"] for chunk in batch],
+            embeddings=vectors[start:start + len(batch)].tolist(),
+            documents=[chunk["document"] for chunk in batch],
+            metadatas=[chunk["metadata"] for chunk in batch],
+        )
+
+    start = 0
+    batch = []
+    with open(chunks_path, encoding="utf-8") as f:
+        for line in f:
+            batch.append(json.loads(line))
+            if len(batch) == REBUILD_BATCH_SIZE:
+                add_batch(batch, start)
+                start += len(batch)
+                batch = []
+    if batch:
+        add_batch(batch, start)
+
+    check_vectordb(vectordb, manifest["count"])
+    return vectordb
+
+
+def recover_vectordb(db_dir, embeddings):
+    """Roll db_dir back to the newest snapshot that passes verification"""
+    # Only the original store is kept; later attempts work on scratch copies of snapshots
+    try:
+        set_aside(db_dir)
+    except Exception as e:
+        print(f"Could not move broken vector store aside, removing it instead: {e}")
+        clear_scratch(db_dir)
+
+    for version in list_snapshots(db_dir):
+        try:
+            manifest = load_manifest(db_dir, version)
+        except Exception as e:
+            print(f"Skipping unreadable snapshot {version}: {e}")
+            continue
+
+        for method in (restore_index, rebuild_from_cache):
+            try:
+                vectordb = method(db_dir, embeddings, version, manifest)
+                print(f"Recovered vector store from snapshot {version} using {method.__name__}")
+                return vectordb
+            except Exception as e:
+                print(f"Could not recover from snapshot {version} with {method.__name__}: {e}")
+                print(traceback.format_exc())
+                SharedSystemClient.clear_system_cache()
+
+    print("No usable snapshot found, starting with an empty vector store")
+    clear_scratch(db_dir)
+    os.makedirs(db_dir, exist_ok=True)
+    return open_chroma(db_dir, embeddings)
+
+
+def open_vectordb(db_dir, embeddings):
+    """Open the vector store, verifying it and rolling back to a snapshot if it is damaged"""
+    manifest = latest_manifest(db_dir)
+    expected_count = manifest["count"] if manifest else None
+
+    vectordb = try_open(db_dir, embeddings, expected_count)
+    if vectordb is not None:
+        return vectordb
+
+    return recover_vectordb(db_dir, embeddings)
+
+
+def document_id(document):
+    """Stable id per source file, so re-ingesting a PDF replaces it instead of adding a copy"""
+    return hashlib.sha256(document.metadata["source"].encode("utf-8")).hexdigest()
+
+
+def ingest_documents(documents, db_dir, embeddings):
+    """Add documents to the vector store and snapshot the result"""
+    os.makedirs(db_dir, exist_ok=True)
+    vectordb = open_vectordb(db_dir, embeddings)
+    count_before = vectordb._collection.count()
+
+    vectordb.add_documents(documents, ids=[document_id(document) for document in documents])
+
+    try:
+        check_vectordb(vectordb, count_before)
+    except Exception as e:
+        # Snapshotting a damaged index would prune a good restore point in its favour
+        print(f"Vector store failed integrity check after ingestion, skipping snapshot: {e}")
+        print(traceback.format_exc())
+        return vectordb
+
+    try:
+        create_snapshot(db_dir, vectordb)
+    except Exception as e:
+        # The ingestion itself succeeded; a failed snapshot only loses the restore point
+        print(f"Error creating vector store snapshot: {e}")
+        print(traceback.format_exc())
+
+    return vectordb